@@ -47,7 +47,8 @@ class CounterfactualExamples:
         for ix, feature in enumerate(self.data_interface.continuous_feature_names):
             self.org_instance[feature] = self.org_instance[feature].astype(float).round(precisions[ix])
 
-        cfs = np.array([self.final_cfs[i][0] for i in range(len(self.final_cfs))])
+        # one row per CF whether final_cfs is a 2-D block or a list of 1-row arrays
+        cfs = np.array([np.ravel(self.final_cfs[i]) for i in range(len(self.final_cfs))])
 
         result = self.data_interface.get_decoded_data(cfs, encoding=self.encoding)
         result = self.data_interface.de_normalize_data(result)
@@ -87,7 +88,7 @@ class CounterfactualExamples:
         for ix, feature in enumerate(self.data_interface.continuous_feature_names):
             self.org_instance[feature] = self.org_instance[feature].astype(float).round(precisions[ix])
 
-        cfs = np.array([self.final_cfs_sparse[i][0] for i in range(len(self.final_cfs_sparse))])
+        cfs = np.array([np.ravel(self.final_cfs_sparse[i]) for i in range(len(self.final_cfs_sparse))])
 
         result = self.data_interface.get_decoded_data(cfs, encoding=self.encoding)
         result = self.data_interface.de_normalize_data(result)
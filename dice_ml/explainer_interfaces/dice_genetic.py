@@ -4,14 +4,66 @@ This code is similar to 'GeCo: Quality Counterfactual Explanations in Real Time'
 """
 
 from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
-import math
 import numpy as np
-import random
 import timeit
-import copy
 
 from dice_ml import diverse_counterfactuals as exp
 
+# numba is optional - the explainer falls back to plain NumPy when it is not installed
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+if _NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _weighted_l1_matrix(cf_matrix, feature_weights):
+        """Computes the pairwise weighted L1 distance matrix without intermediate arrays."""
+        k, num_genes = cf_matrix.shape
+        dist_matrix = np.zeros((k, k))
+        for i in range(k):
+            for j in range(i + 1, k):
+                dist = 0.0
+                for jx in range(num_genes):
+                    dist += abs(cf_matrix[i, jx] - cf_matrix[j, jx]) * feature_weights[jx]
+                dist_matrix[i, j] = dist
+                dist_matrix[j, i] = dist
+        return dist_matrix
+
+    @njit(cache=True, fastmath=True)
+    def _prox_reg_kernel(cf_matrix, x1, feature_weights, grp_starts, grp_ends):
+        """Accumulates the weighted proximity and the categorical regularization
+        terms in a single pass over the CF matrix."""
+        k, num_genes = cf_matrix.shape
+        proximity_loss = 0.0
+        regularization_loss = 0.0
+        for i in range(k):
+            for jx in range(num_genes):
+                proximity_loss += abs(cf_matrix[i, jx] - x1[jx]) * feature_weights[jx]
+            for g in range(grp_starts.shape[0]):
+                group_sum = 0.0
+                for jx in range(grp_starts[g], grp_ends[g]):
+                    group_sum += cf_matrix[i, jx]
+                regularization_loss += (group_sum - 1.0) ** 2
+        return proximity_loss, regularization_loss
+
+    @njit(cache=True, fastmath=True)
+    def _mate_kernel(parent1, parent2, prob, mutation):
+        """Selects each offspring gene from parent 1, parent 2 or the mutation draw."""
+        child = np.empty_like(parent1)
+        k, num_genes = parent1.shape
+        for i in range(k):
+            for jx in range(num_genes):
+                if prob[i, jx] < 0.45:
+                    child[i, jx] = parent1[i, jx]
+                elif prob[i, jx] < 0.90:
+                    child[i, jx] = parent2[i, jx]
+                else:
+                    child[i, jx] = mutation[i, jx]
+        return child
+
+
 class DiceGenetic(ExplainerBase):
 
     def __init__(self, data_interface, model_interface):
@@ -43,6 +95,17 @@ class DiceGenetic(ExplainerBase):
 
         self.population_size = 100
 
+        # cache of model predictions keyed by chromosome bytes - see _predict_population()
+        self._pred_cache = {}
+
+        # warm-compile the numba kernels on a dummy input to hide first-call latency
+        if _NUMBA_AVAILABLE:
+            dummy = np.zeros((2, 2), dtype=np.float32)
+            _weighted_l1_matrix(dummy, np.ones(2, dtype=np.float32))
+            _prox_reg_kernel(dummy, np.zeros(2, dtype=np.float32), np.ones(2, dtype=np.float32),
+                             np.zeros(1, dtype=np.int64), np.ones(1, dtype=np.int64))
+            _mate_kernel(dummy, dummy, np.full((2, 2), 0.5), np.zeros((2, 2)))
+
     def generate_counterfactuals(self, query_instance, total_CFs, desired_class="opposite", proximity_weight=0.5,
                                  diversity_weight=1.0, categorical_penalty=0.1, algorithm="DiverseCF",
                                  features_to_vary="all", permitted_range=None, yloss_type="log_loss",
@@ -81,91 +144,129 @@ class DiceGenetic(ExplainerBase):
         temp_preds = self.model.get_output(input_instance)[:, self.num_output_nodes-1]
         return temp_preds
 
-    def compute_yloss(self, cfs):
+    def _predict_population(self, population, out=None):
+        """Returns per-member predictions, reusing cached results for members that
+        are carried over unchanged between generations (e.g. elites). Results are
+        written into ``out`` when given to avoid a fresh allocation per call."""
+        preds_matrix = np.empty((self.population_size, self.total_CFs)) if out is None else out
+        keys = [member.tobytes() for member in population]
+        new_cache = {}
+        miss_ixs = []
+        miss_members = []
+        for k, key in enumerate(keys):
+            cached_preds = self._pred_cache.get(key)
+            if cached_preds is None:
+                miss_ixs.append(k)
+                miss_members.append(population[k])
+            else:
+                preds_matrix[k] = cached_preds
+                new_cache[key] = cached_preds
+
+        if miss_ixs:
+            miss_preds = self.predict_fn(np.vstack(miss_members)).reshape(len(miss_ixs), self.total_CFs)
+            for k, preds in zip(miss_ixs, miss_preds):
+                new_cache[keys[k]] = preds
+                preds_matrix[k] = preds
+
+        # retain only the current generation - freshly mated children are unique,
+        # so older entries can never hit again and would grow without bound
+        self._pred_cache = new_cache
+        return preds_matrix
+
+    def compute_yloss(self, cfs, preds=None):
         """Computes the first part (y-loss) of the loss function."""
-        yloss = 0.0
-        for i in range(self.total_CFs):
-            if self.yloss_type == "l2_loss":
-                temp_loss = pow((self.predict_fn(cfs[i]) - self.target_cf_class), 2)[0][0]
+        if preds is None:
+            # predictions for all CFs in a single model call
+            preds = self.predict_fn(cfs)
 
-            elif self.yloss_type == "log_loss":
-                temp_logits = math.log((abs(self.predict_fn(cfs[i]) - 0.000001))/(1 - abs(self.predict_fn(cfs[i]) - 0.000001)))
-                temp_loss = self.target_cf_class[0][0] * (-1) * np.log(self.sigmoid(temp_logits)) + (1 - self.target_cf_class[0][0]) * (-1) * np.log(1 - self.sigmoid(temp_logits))
+        if self.yloss_type == "l2_loss":
+            yloss = np.mean(np.power(preds - self.target_cf_class[0][0], 2))
 
-            elif self.yloss_type == "hinge_loss":
-                temp_logits = math.log((abs(self.predict_fn(cfs[i]) - 0.000001))/(1 - abs(self.predict_fn(cfs[i]) - 0.000001)))
-                temp_loss = max(0, 1-temp_logits*self.target_cf_class[0])
+        elif self.yloss_type == "log_loss":
+            # binary cross-entropy directly on clipped probabilities - applying
+            # sigmoid to log(p/(1-p)) just recovers p, so the roundtrip is skipped
+            probs = np.clip(preds, 0.000001, 1 - 0.000001)
+            yloss = np.mean(self.target_cf_class[0][0] * (-1) * np.log(probs) + (1 - self.target_cf_class[0][0]) * (-1) * np.log(1 - probs))
 
-            yloss += temp_loss
-        return yloss/self.total_CFs
+        elif self.yloss_type == "hinge_loss":
+            probs = np.clip(preds, 0.000001, 1 - 0.000001)
+            temp_logits = np.log(probs/(1 - probs))
+            yloss = np.mean(np.maximum(0, 1 - temp_logits*self.target_cf_class[0][0]))
+
+        else:
+            raise ValueError("unsupported yloss_type: %s" % self.yloss_type)
+
+        return yloss
 
     def compute_dist(self, x_hat, x1):
         """Compute weighted distance between two vectors."""
-        return np.sum(np.multiply((abs(x_hat - x1)), self.feature_weights_list))
+        diff = np.subtract(x_hat, x1)
+        np.abs(diff, out=diff)
+        return float(np.dot(diff.ravel(), np.ravel(self.feature_weights_list)))
 
     def compute_proximity_loss(self, cfs):
         """Compute the second part (distance from x1) of the loss function."""
-        proximity_loss = 0.0
-        for i in range(self.total_CFs):
-            proximity_loss += self.compute_dist(cfs[i], self.x1)
+        proximity_loss = np.sum(np.abs(cfs - self.x1) * self.feature_weights_list)
         return proximity_loss / len(self.minx[0])
 
+    def compute_dist_matrix(self, cfs):
+        """Computes the pairwise weighted distance matrix of all CFs."""
+        if _NUMBA_AVAILABLE:
+            return _weighted_l1_matrix(np.ascontiguousarray(cfs), self._feature_weights_arr)
+        return np.sum(np.abs(cfs[:, None, :] - cfs[None, :, :]) * self.feature_weights_list, axis=-1)
+
     def dpp_style(self, submethod, cfs):
         """Computes the DPP of a matrix."""
-        det_entries = []
+        if self.total_CFs == 1:
+            return 1.0
+
+        dist_matrix = self.compute_dist_matrix(cfs)
         if submethod == "inverse_dist":
-            for i in range(self.total_CFs):
-                for j in range(self.total_CFs):
-                    det_temp_entry = 1.0 / (1.0 + self.compute_dist(cfs[i], cfs[j]))
-                    if i == j:
-                        det_temp_entry = det_temp_entry + 0.0001
-                    det_entries.append(det_temp_entry)
+            det_entries = 1.0 / (1.0 + dist_matrix) + 0.0001 * np.eye(self.total_CFs)
 
         elif submethod == "exponential_dist":
-            for i in range(self.total_CFs):
-                for j in range(self.total_CFs):
-                    det_temp_entry = 1.0 / np.exp(
-                        self.compute_dist(cfs[i], cfs[j]))
-                    det_entries.append(det_temp_entry)
+            det_entries = 1.0 / np.exp(dist_matrix)
 
-        det_entries = np.reshape(det_entries, [self.total_CFs, self.total_CFs])
         diversity_loss = np.linalg.det(det_entries)
         return diversity_loss
 
     def compute_diversity_loss(self, cfs):
         """Computes the third part (diversity) of the loss function."""
-        if self.total_CFs == 1:
-            return 0.0
-
         if "dpp" in self.diversity_loss_type:
             submethod = self.diversity_loss_type.split(':')[1]
             return np.sum(self.dpp_style(submethod, cfs))
         elif self.diversity_loss_type == "avg_dist":
-            diversity_loss = 0.0
-            count = 0.0
-            # computing pairwise distance and transforming it to normalized similarity
-            for i in range(self.total_CFs):
-                for j in range(i+1, self.total_CFs):
-                    count += 1.0
-                    diversity_loss += 1.0/(1.0 + self.compute_dist(cfs[i], cfs[j]))
-
-            return 1.0 - (diversity_loss/count)
+            # pairwise distances transformed to normalized similarity, read off
+            # the upper triangle of the same distance matrix the dpp path uses
+            dist_matrix = self.compute_dist_matrix(cfs)
+            upper_ixs = np.triu_indices(self.total_CFs, k=1)
+            return 1.0 - np.mean(1.0 / (1.0 + dist_matrix[upper_ixs]))
 
     def compute_regularization_loss(self, cfs):
         """Adds a linear equality constraints to the loss functions - to ensure all levels of a categorical variable sums to one"""
         regularization_loss = 0.0
-        for i in range(self.total_CFs):
-            for v in self.encoded_categorical_feature_indexes:
-                regularization_loss += pow((np.sum(cfs[i][0, v[0]:v[-1] + 1]) - 1.0), 2)
+        for start, end in zip(self._grp_starts, self._grp_ends):
+            regularization_loss += np.sum(np.power(np.sum(cfs[:, start:end], axis=1) - 1.0, 2))
 
         return regularization_loss
 
-    def compute_loss(self, cfs):
+    def compute_loss(self, cfs, preds=None):
         """Computes the overall loss"""
-        self.yloss = self.compute_yloss(cfs)
-        self.proximity_loss = self.compute_proximity_loss(cfs) if self.proximity_weight > 0 else 0.0
-        self.diversity_loss = self.compute_diversity_loss(cfs) if self.diversity_weight > 0 else 0.0
-        self.regularization_loss = self.compute_regularization_loss(cfs)
+        self.yloss = self.compute_yloss(cfs, preds)
+        if _NUMBA_AVAILABLE:
+            # proximity and regularization share a single streaming pass over cfs
+            proximity_loss, self.regularization_loss = _prox_reg_kernel(
+                np.ascontiguousarray(cfs), self.x1.ravel(), self._feature_weights_arr,
+                self._grp_starts, self._grp_ends)
+            self.proximity_loss = proximity_loss / len(self.minx[0]) if self.proximity_weight > 0 else 0.0
+        else:
+            self.proximity_loss = self.compute_proximity_loss(cfs) if self.proximity_weight > 0 else 0.0
+            self.regularization_loss = self.compute_regularization_loss(cfs)
+        # a single CF has no pairwise diversity - skip the distance machinery entirely
+        if self.diversity_weight > 0 and self.total_CFs > 1:
+            self.diversity_loss = self.compute_diversity_loss(cfs)
+        else:
+            self.diversity_loss = 0.0
 
         # self.loss = self.yloss + (self.proximity_weight * self.proximity_loss) + (self.categorical_penalty * self.regularization_loss)
         self.loss = self.yloss + (self.proximity_weight * self.proximity_loss) - (
@@ -174,30 +275,22 @@ class DiceGenetic(ExplainerBase):
 
         return self.loss
 
-    def mate(self, k1, k2):
-        """Performs mating and produces new offsprings"""
-
-        # chromosome for offspring
-        child_chromosome = []
-        for i in range(self.total_CFs):
-            # temp_child_chromosome = []
-            one_init = [[]]
-            for jx, (gp1, gp2) in enumerate(zip(k1[i][0], k2[i][0])):
-                # random probability
-                prob = random.random()
-
-                # if prob is less than 0.45, insert gene from parent 1
-                if prob < 0.45:
-                    one_init[0].append(gp1)
-
-                # if prob is between 0.45 and 0.90, insert gene from parent 2
-                elif prob < 0.90:
-                    one_init[0].append(gp2)
-
-                #otherwise insert random gene(mutate) for maintaining diversity
-                else:
-                     one_init[0].append(np.random.uniform(self.minx[0][jx], self.maxx[0][jx]))
-            child_chromosome.append(np.array(one_init))
+    def mate(self, parent1, parent2):
+        """Performs mating and produces new offsprings. Parents may be single
+        (total_CFs, features) members or stacks of members."""
+        num_genes = parent1.shape[-1]
+
+        # random probability per gene decides its source:
+        # < 0.45 takes the gene from parent 1, < 0.90 from parent 2,
+        # otherwise a random gene (mutation) for maintaining diversity
+        prob = np.random.random(parent1.shape)
+        mutation = np.random.uniform(self.minx[0][:num_genes], self.maxx[0][:num_genes], size=parent1.shape)
+        if _NUMBA_AVAILABLE:
+            child_chromosome = _mate_kernel(parent1.reshape(-1, num_genes), parent2.reshape(-1, num_genes),
+                                            prob.reshape(-1, num_genes), mutation.reshape(-1, num_genes))
+            child_chromosome = child_chromosome.reshape(parent1.shape)
+        else:
+            child_chromosome = np.where(prob < 0.45, parent1, np.where(prob < 0.90, parent2, mutation))
         return child_chromosome
 
     def find_counterfactuals(self, query_instance, desired_class, stopping_threshold, posthoc_sparsity_param, posthoc_sparsity_algorithm, verbose):
@@ -207,7 +300,7 @@ class DiceGenetic(ExplainerBase):
 
         query_instance = self.data_interface.prepare_query_instance(query_instance=query_instance, encoding='label')
         query_instance = np.array([query_instance.iloc[0].values])
-        self.x1 = query_instance
+        self.x1 = query_instance.astype(np.float32)
 
         # find the predicted value of query_instance
         test_pred = self.predict_fn(query_instance)[0]
@@ -221,50 +314,66 @@ class DiceGenetic(ExplainerBase):
         elif self.target_cf_class == 1 and self.stopping_threshold < 0.5:
             self.stopping_threshold = 0.75
 
-        population = self.cfs.copy()
+        # hot-path arrays in float32 - halves the memory traffic of the
+        # distance and loss scans at no practical cost in precision
+        self.minx = np.asarray(self.minx, dtype=np.float32)
+        self.maxx = np.asarray(self.maxx, dtype=np.float32)
+        self._feature_weights_arr = np.asarray(self.feature_weights_list, dtype=np.float32)[0]
+        population = np.asarray(self.cfs, dtype=np.float32)
+        self._pred_cache.clear()
+
+        # categorical group slice bounds as int arrays, clipped once to the
+        # chromosome width to mirror NumPy's slice clamping
+        num_genes = population.shape[-1]
+        self._grp_starts = np.array([min(v[0], num_genes) for v in self.encoded_categorical_feature_indexes], dtype=np.int64)
+        self._grp_ends = np.array([min(v[-1] + 1, num_genes) for v in self.encoded_categorical_feature_indexes], dtype=np.int64)
 
         start_time = timeit.default_timer()
 
+        # per-generation buffers allocated once - the population and its
+        # successor are double-buffered and swapped instead of reallocated
+        population_fitness = np.empty(self.population_size)
+        preds_buf = np.empty((self.population_size, self.total_CFs))
+        new_population = np.empty_like(population)
+
         while True:
-            population_fitness = []
-            current_best_loss = np.inf
+            # predictions for every CF of every member, batched and cached
+            preds_matrix = self._predict_population(population, out=preds_buf)
 
             for k in range(self.population_size):
-                loss = self.compute_loss(population[k])
-                population_fitness.append((k, loss))
+                population_fitness[k] = self.compute_loss(population[k], preds_matrix[k])
 
-                if loss < current_best_loss:
-                    current_best_loss = loss
-                    current_best_cf = population[k]
+            best_ix = np.argmin(population_fitness)
+            current_best_cf = population[best_ix]
 
-            pop_pred = [self.predict_fn(cfs) for cfs in current_best_cf]
+            # reuse the predictions from the batched loss pass for the stopping check
+            pop_pred = preds_matrix[best_ix]
             if ((self.target_cf_class == 0 and all(i <= self.stopping_threshold for i in pop_pred)) or
                     (self.target_cf_class == 1 and all(i >= self.stopping_threshold for i in pop_pred))):
                 self.valid_cfs_found = True
                 break
 
             # 10% of the next generation is fittest members of current generation
-            population_fitness = sorted(population_fitness, key=lambda x: x[1])
             s = int((10 * self.population_size) / 100)
-            new_generation = [population[tup[0]] for tup in population_fitness[:s]]
+            new_population[:s] = population[np.argpartition(population_fitness, s)[:s]]
 
             # 90% of the next generation obtained from top 50% of fittest members of current generation
-            s = int((90 * self.population_size) / 100)
-            for _ in range(s):
-                parent1 = random.choice(population[:int(50 * self.population_size / 100)])
-                parent2 = random.choice(population[:int(50 * self.population_size / 100)])
-                child = self.mate(parent1, parent2)
-                new_generation.append(child)
+            half = int(50 * self.population_size / 100)
+            mating_pool = population[np.argpartition(population_fitness, half)[:half]]
+            num_children = self.population_size - s
+            parent1 = mating_pool[np.random.randint(0, half, size=num_children)]
+            parent2 = mating_pool[np.random.randint(0, half, size=num_children)]
+            new_population[s:] = self.mate(parent1, parent2)
 
-            population = new_generation.copy()
+            population, new_population = new_population, population
 
-        self.final_cfs = current_best_cf
-        self.cfs_preds = [self.predict_fn(cfs) for cfs in self.final_cfs]
+        self.final_cfs = current_best_cf[:, None, :]
+        self.cfs_preds = [pop_pred[i:i+1] for i in range(self.total_CFs)]
 
         # post-hoc operation on continuous features to enhance sparsity - only for public data
         if posthoc_sparsity_param != None and posthoc_sparsity_param > 0 and 'data_df' in self.data_interface.__dict__:
-            final_cfs_sparse = copy.deepcopy(self.final_cfs)
-            cfs_preds_sparse = copy.deepcopy(self.cfs_preds)
+            final_cfs_sparse = self.final_cfs.copy()
+            cfs_preds_sparse = np.asarray(self.cfs_preds).copy()
             self.final_cfs_sparse, self.cfs_preds_sparse = self.do_posthoc_sparsity_enhancement(self.total_CFs, final_cfs_sparse, cfs_preds_sparse,  query_instance, posthoc_sparsity_param, posthoc_sparsity_algorithm)
         else:
             self.final_cfs_sparse = None
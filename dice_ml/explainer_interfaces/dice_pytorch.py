@@ -115,7 +115,10 @@ class DicePyTorch(ExplainerBase):
 
     def get_model_output(self, input_instance):
         """get output probability of ML model"""
-        return self.model.get_output(input_instance)[(self.num_ouput_nodes-1):]
+        output = self.model.get_output(input_instance)
+        if output.dim() == 2: # batched input - take the target node of every row
+            return output[:, (self.num_ouput_nodes-1)]
+        return output[(self.num_ouput_nodes-1):]
 
     def predict_fn(self, input_instance):
         """prediction function"""
@@ -178,6 +178,10 @@ class DiceTensorFlow1(ExplainerBase):
 
     def predict_fn(self, input_instance):
         """prediction function"""
+        input_instance = np.asarray(input_instance)
+        # input_tensor is a fixed (1, num_features) variable, so batches are fed one row at a time
+        if input_instance.ndim == 2 and input_instance.shape[0] > 1:
+            return np.concatenate([self.predict_fn(row[None, :]) for row in input_instance])
         temp_preds = self.dice_sess.run(self.output_tensor, feed_dict={self.input_tensor: input_instance})
         return np.array([preds[(self.num_ouput_nodes-1):] for preds in temp_preds])
 
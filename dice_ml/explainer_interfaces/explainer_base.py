@@ -5,12 +5,40 @@
 import numpy as np
 import pandas as pd
 from pandas.api.types import is_numeric_dtype
-import random
+from scipy.special import expit
 import timeit
 import copy
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 from dice_ml import diverse_counterfactuals as exp
 
+# numba is optional - the search helpers fall back to plain NumPy when it is not installed
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+if _NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _linear_step(vals, query_val, change):
+        """Takes one greedy step of the linear search towards the query value,
+        returning the previous values and the pre-step differences."""
+        n = vals.shape[0]
+        old_vals = np.empty(n)
+        diffs = np.empty(n)
+        for i in range(n):
+            old_vals[i] = vals[i]
+            d = query_val - vals[i]
+            diffs[i] = d
+            if d > 0:
+                vals[i] = vals[i] + change
+            elif d < 0:
+                vals[i] = vals[i] - change
+        return old_vals, diffs
+
+
 class ExplainerBase:
 
     def __init__(self, data_interface, model_interface=None):
@@ -21,6 +49,7 @@ class ExplainerBase:
         """
         # TODO: This assignment simply the error. Need to verify if it makes sense
         self.total_random_inits = 0
+        self.num_output_nodes = None
 
         self.model = model_interface
         # get data-related parameters - minx and max for normalized continuous features
@@ -35,14 +64,28 @@ class ExplainerBase:
         self.cont_minx = list(org_minx[0][self.encoded_continuous_feature_indexes])
         self.cont_maxx = list(org_maxx[0][self.encoded_continuous_feature_indexes])
 
-        # decimal precisions for continuous features
-        self.cont_precisions = [self.data_interface.get_decimal_precisions()[ix] for ix in self.encoded_continuous_feature_indexes]
+        # decimal precisions and MADs computed once - training data is static
+        self.decimal_precisions = self.data_interface.get_decimal_precisions()
+        self.cont_precisions = [self.decimal_precisions[ix] for ix in self.encoded_continuous_feature_indexes]
+        self.normalized_mads = self.data_interface.get_valid_mads(normalized=True)
+
+        # O(1) feature name -> encoded column index lookups
+        self.encoded_feature_ixs = {feature: ix for ix, feature in enumerate(self.data_interface.encoded_feature_names)}
+
+        # sparsity search order cache keyed by posthoc_sparsity_param - see get_sparsity_setup()
+        self._sparsity_setup_cache = {}
 
 
-    def generate_counterfactuals_batch(self, query_instances, total_CFs, desired_class="opposite", permitted_range=None, features_to_vary="all", stopping_threshold=0.5, posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear", sample_size=1000, random_seed=17, verbose=True):
-        res_arr = []
-        for query_instance in query_instances:
-            res = self.generate_counterfactuals(query_instance, total_CFs,
+    def generate_counterfactuals_batch(self, query_instances, total_CFs, desired_class="opposite", permitted_range=None, features_to_vary="all", stopping_threshold=0.5, posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear", sample_size=1000, random_seed=17, verbose=True, n_jobs=None):
+        """Generates counterfactuals for several query instances - see generate_counterfactuals() for the shared parameters.
+
+        :param n_jobs: Number of worker threads used to process query instances in parallel, -1 for one per CPU. Query instances are independent and most of the time goes into model predictions, which release the GIL for the common frameworks. None or 1 keeps the sequential behavior.
+        """
+        def run_one(query_instance):
+            # each worker runs on a shallow copy since generate_counterfactuals
+            # keeps per-query state on the explainer
+            explainer = copy.copy(self) if n_jobs not in (None, 1) else self
+            return explainer.generate_counterfactuals(query_instance, total_CFs,
                     desired_class=desired_class,
                     permitted_range=permitted_range,
                     features_to_vary=features_to_vary,
@@ -52,8 +95,13 @@ class ExplainerBase:
                     sample_size=sample_size,
                     random_seed=random_seed,
                     verbose=verbose)
-            res_arr.append(res)
-        return res_arr
+
+        if n_jobs is None or n_jobs == 1:
+            return [run_one(query_instance) for query_instance in query_instances]
+
+        max_workers = os.cpu_count() if n_jobs == -1 else n_jobs
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run_one, query_instances))
 
     def generate_counterfactuals(self, query_instance, total_CFs, desired_class="opposite", permitted_range=None, features_to_vary="all", stopping_threshold=0.5, posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear", sample_size=1000, random_seed=17, verbose=True):
         """Generate counterfactuals by randomly sampling features.
@@ -82,7 +130,7 @@ class ExplainerBase:
                 self.minx, self.maxx = self.data_interface.get_minx_maxx(normalized=True)
                 for feature in self.data_interface.continuous_feature_names:
                     if feature in self.data_interface.permitted_range:
-                        feat_ix = self.data_interface.encoded_feature_names.index(feature)
+                        feat_ix = self.encoded_feature_ixs[feature]
                         self.cont_minx[feat_ix] = self.data_interface.permitted_range[feature][0]
                         self.cont_maxx[feat_ix] = self.data_interface.permitted_range[feature][1]
 
@@ -96,9 +144,11 @@ class ExplainerBase:
                 if feature not in features_to_vary:
                     self.fixed_features_values[feature] = query_instance[feature]
 
-        # number of output nodes of ML model
-        temp_input = np.random.rand(1,len(self.data_interface.encoded_feature_names))
-        self.num_output_nodes = len(self.model.get_output(temp_input))
+        # number of output nodes of ML model - probed on the first call only,
+        # it does not change between queries
+        if self.num_output_nodes is None:
+            temp_input = np.random.rand(1,len(self.data_interface.encoded_feature_names))
+            self.num_output_nodes = len(self.model.get_output(temp_input))
 
         # Prepares user defined query_instance for DiCE.
         query_instance = self.data_interface.prepare_query_instance(query_instance=query_instance, encoding='one-hot')
@@ -120,33 +170,37 @@ class ExplainerBase:
         start_time = timeit.default_timer()
         samples = get_samples(self, self.fixed_features_values, sampling_random_seed=random_seed, sampling_size=sample_size)
 
-        cfs = self.data_interface.prepare_query_instance(query_instance=samples, encoding='one-hot').values
-        cf_preds = self.predict_fn(cfs)
-        cfs_df = pd.DataFrame(np.append(cfs, np.array([cf_preds]).T, axis=1), columns = self.data_interface.encoded_feature_names + [self.data_interface.outcome_name])
+        # float32 throughout - pandas hands back float64, and every implicit
+        # cast further down would copy the whole (sample_size, num_features) block
+        cfs = self.data_interface.prepare_query_instance(query_instance=samples, encoding='one-hot').values.astype(np.float32, copy=False)
+        cf_preds = self.predict_fn(cfs).astype(np.float32, copy=False)
 
-        # check validity of CFs
-        cfs_df['validity'] = cfs_df[self.data_interface.outcome_name].apply(lambda pred: 1 if ((self.target_cf_class == 0 and pred<= self.stopping_threshold) or (self.target_cf_class == 1 and pred>= self.stopping_threshold)) else 0)
-        self.total_cfs_found = cfs_df[cfs_df['validity']==1].shape[0]
+        # check validity of CFs - a single boolean comparison over the whole
+        # prediction vector instead of a Python lambda per row
+        valid_mask = ((self.target_cf_class == 0) & (cf_preds <= self.stopping_threshold)) | \
+                     ((self.target_cf_class == 1) & (cf_preds >= self.stopping_threshold))
+        valid_ixs = np.flatnonzero(valid_mask)
+        self.total_cfs_found = len(valid_ixs)
 
         if self.total_cfs_found >= self.total_CFs:
-            cfs_df = cfs_df[cfs_df['validity']==1].sample(n=self.total_CFs, random_state=random_seed)
+            # same draw DataFrame.sample(random_state=...) would make
+            chosen_ixs = valid_ixs[np.random.RandomState(random_seed).choice(
+                self.total_cfs_found, size=self.total_CFs, replace=False)]
             self.valid_cfs_found = True
         else:
-            #temp_df = cfs_df[cfs_df['validity']==0].sample(n=self.total_CFs-self.total_cfs_found, random_state=random_seed)
-            #cfs_df = pd.concat([cfs_df[cfs_df['validity']==1], temp_df], ignore_index=True)
-            cfs_df = cfs_df[cfs_df['validity']==1]
+            chosen_ixs = valid_ixs
             self.valid_cfs_found = False
 
-        # convert to the format that is consistent with dice_tensorflow
-        temp = cfs_df[self.data_interface.encoded_feature_names].values
-        self.final_cfs = [np.array([arr]) for arr in temp]
-        temp = cfs_df[[self.data_interface.outcome_name]].values
-        self.cfs_preds = [np.array([arr]) for arr in temp]
+        # store CFs as one (num_cfs, num_features) block and predictions as a
+        # flat vector - batched consumers index rows directly, with no
+        # intermediate DataFrame build and re-extract
+        self.final_cfs = cfs[chosen_ixs]
+        self.cfs_preds = cf_preds[chosen_ixs]
 
         # post-hoc operation on continuous features to enhance sparsity - only for public data
         if posthoc_sparsity_param != None and posthoc_sparsity_param > 0 and 'data_df' in self.data_interface.__dict__:
-            final_cfs_sparse = copy.deepcopy(self.final_cfs)
-            cfs_preds_sparse = copy.deepcopy(self.cfs_preds)
+            final_cfs_sparse = self.final_cfs.copy()
+            cfs_preds_sparse = self.cfs_preds.copy()
             self.final_cfs_sparse, self.cfs_preds_sparse = self.do_posthoc_sparsity_enhancement(self.total_CFs, final_cfs_sparse, cfs_preds_sparse,  query_instance, posthoc_sparsity_param, posthoc_sparsity_algorithm)
         else:
             self.final_cfs_sparse = None
@@ -170,13 +224,9 @@ class ExplainerBase:
         importance = {}
         for col in org_instance.columns:
             importance[col] = 0
-        for index, row in cf_object.final_cfs_df.iterrows():
-            for col in self.data_interface.continuous_feature_names:
-                if not np.isclose(org_instance[col][0], row[col]):
-                    importance[col] += 1
-            for col in self.data_interface.categorical_feature_names:
-                if org_instance[col][0] != row[col]:
-                        importance[col] += 1
+        cont_counts, cat_counts = self.count_changed_features(cf_object.final_cfs_df, org_instance)
+        importance.update(zip(self.data_interface.continuous_feature_names, cont_counts))
+        importance.update(zip(self.data_interface.categorical_feature_names, cat_counts))
 
         for col in org_instance.columns:
             importance[col] = importance[col]/cf_object.final_cfs_df.shape[0]
@@ -188,21 +238,30 @@ class ExplainerBase:
         for col in allcols:
             importance[col]= 0
         for cf_object in cf_object_list:
-            org_instance = cf_object.org_instance
-            for index, row in cf_object.final_cfs_df.iterrows():
-                for col in self.data_interface.continuous_feature_names:
-                    if not np.isclose(org_instance[col][0], row[col]):
-                        importance[col] += 1
-                for col in self.data_interface.categorical_feature_names:
-                    if org_instance[col][0] != row[col]:
-                            importance[col] += 1
+            cont_counts, cat_counts = self.count_changed_features(cf_object.final_cfs_df, cf_object.org_instance)
+            for col, count in zip(self.data_interface.continuous_feature_names, cont_counts):
+                importance[col] += count
+            for col, count in zip(self.data_interface.categorical_feature_names, cat_counts):
+                importance[col] += count
 
         for col in allcols:
             importance[col] = importance[col]/(cf_object_list[0].final_cfs_df.shape[0]*len(cf_object_list))
         return importance
 
+    def count_changed_features(self, cfs_df, org_instance):
+        """Counts per feature how many CFs differ from the original instance,
+        using whole-column comparisons instead of a Python loop per CF row."""
+        cont_cols = self.data_interface.continuous_feature_names
+        cat_cols = self.data_interface.categorical_feature_names
+        cont_changed = ~np.isclose(cfs_df[cont_cols].values.astype(np.float64),
+                                   org_instance[cont_cols].values.astype(np.float64))
+        cat_changed = cfs_df[cat_cols].values != org_instance[cat_cols].values
+        return cont_changed.sum(axis=0).tolist(), cat_changed.sum(axis=0).tolist()
+
     def predict_fn(self, input_instance):
         """prediction function"""
+        if input_instance.shape[0] == 0: # skip the model dispatch for empty batches
+            return np.empty(0)
         return self.model.get_output(input_instance)[:, self.num_output_nodes-1]
 
     def do_posthoc_sparsity_enhancement(self, total_CFs, final_cfs_sparse, cfs_preds_sparse, query_instance, posthoc_sparsity_param, posthoc_sparsity_algorithm):
@@ -215,39 +274,70 @@ class ExplainerBase:
         :param posthoc_sparsity_algorithm: Perform either linear or binary search. Prefer binary search when a feature range is large (for instance, income varying from 10k to 1000k) and only if the features share a monotonic relationship with predicted outcome in the model.
         """
 
-        normalized_quantiles = self.data_interface.get_quantiles_from_training_data(quantile=posthoc_sparsity_param, normalized=True)
-        normalized_mads = self.data_interface.get_valid_mads(normalized=True)
-        for feature in normalized_quantiles:
-            normalized_quantiles[feature] = min(normalized_quantiles[feature], normalized_mads[feature])
-
-        features_sorted = sorted(normalized_quantiles.items(), key=lambda kv: kv[1], reverse=True)
-        for ix in range(len(features_sorted)):
-            features_sorted[ix] = features_sorted[ix][0]
-        decimal_prec = self.data_interface.get_decimal_precisions()[0:len(self.encoded_continuous_feature_indexes)]
+        normalized_quantiles, features_sorted = self.get_sparsity_setup(posthoc_sparsity_param)
+        decimal_prec = self.decimal_precisions[0:len(self.encoded_continuous_feature_indexes)]
 
         # looping the find CFs depending on whether its random initialization or not
         loop_find_CFs = self.total_random_inits if self.total_random_inits > 0 else 1
-        for cf_ix in range(min(max(loop_find_CFs, self.total_CFs), len(final_cfs_sparse))):
-            current_pred = self.predict_fn(final_cfs_sparse[cf_ix])
-            if((self.target_cf_class == 0 and current_pred > self.stopping_threshold) or # perform sparsity correction for only valid CFs
-               (self.target_cf_class == 1 and current_pred < self.stopping_threshold)):
-               continue
-
-            for feature in features_sorted:
-                current_pred = self.predict_fn(final_cfs_sparse[cf_ix])
-                feat_ix = self.data_interface.encoded_feature_names.index(feature)
-                diff = query_instance.ravel()[feat_ix] - final_cfs_sparse[cf_ix].ravel()[feat_ix]
-
-                if(abs(diff) <= normalized_quantiles[feature]):
-                    if posthoc_sparsity_algorithm == "linear":
-                        final_cfs_sparse[cf_ix] = do_linear_search(self, diff, decimal_prec, query_instance, cf_ix, feat_ix, final_cfs_sparse, current_pred)
+        n_cfs = min(max(loop_find_CFs, self.total_CFs), len(final_cfs_sparse))
+        if n_cfs == 0:
+            return final_cfs_sparse, cfs_preds_sparse
+
+        # stack the CF rows once so that every probe during the search becomes
+        # a single batched model call instead of one call per CF. The search
+        # workspace stays float64: for large-range features the per-step change
+        # can be smaller than one float32 ulp of the stored value, which would
+        # stall the linear search - and at total_CFs rows the extra width is free
+        cfs_matrix = np.vstack([final_cfs_sparse[cf_ix] for cf_ix in range(n_cfs)]).astype(np.float64)
+        query_row = query_instance.ravel()
+
+        # sibling explainers keep target_cf_class as a (1,1) array (or torch
+        # tensor) and their predict_fn may return (N,1) - normalize both so the
+        # validity masks stay 1-D and index per CF row
+        target_class = float(np.ravel(self.target_cf_class)[0])
+        current_preds = np.ravel(self.predict_fn(cfs_matrix))
+        # perform sparsity correction for only valid CFs
+        skip = ((target_class == 0) & (current_preds > self.stopping_threshold)) | \
+               ((target_class == 1) & (current_preds < self.stopping_threshold))
+        active_ixs = np.where(~skip)[0]
+
+        if len(active_ixs) > 0:
+            # searches only ever touch their own column, so eligibility of every
+            # (CF, feature) pair can be computed in one comparison up front
+            feat_ixs = np.array([self.encoded_feature_ixs[feature] for feature in features_sorted])
+            quantiles = np.array([normalized_quantiles[feature] for feature in features_sorted])
+            diffs = query_row[feat_ixs] - cfs_matrix[np.ix_(active_ixs, feat_ixs)]
+            eligible = np.abs(diffs) <= quantiles
+
+            for pos, feature in enumerate(features_sorted):
+                eligible_ixs = active_ixs[eligible[:, pos]]
+                feat_ix = feat_ixs[pos]
+
+                if len(eligible_ixs) == 0:
+                    continue
+                if posthoc_sparsity_algorithm == "linear":
+                    do_linear_search(self, decimal_prec, query_row, feat_ix, cfs_matrix, eligible_ixs)
+                elif posthoc_sparsity_algorithm == "binary":
+                    do_binary_search(self, decimal_prec, query_row, feat_ix, cfs_matrix, eligible_ixs)
+
+            preds_after = np.ravel(self.predict_fn(cfs_matrix[active_ixs]))
+            for pos, cf_ix in enumerate(active_ixs):
+                final_cfs_sparse[cf_ix][:] = cfs_matrix[cf_ix]
+                cfs_preds_sparse[cf_ix] = preds_after[pos]
 
-                    elif posthoc_sparsity_algorithm == "binary":
-                        final_cfs_sparse[cf_ix] = do_binary_search(self, diff, decimal_prec, query_instance, cf_ix, feat_ix, final_cfs_sparse, current_pred)
+        return final_cfs_sparse, cfs_preds_sparse
 
-            cfs_preds_sparse[cf_ix] = self.predict_fn(final_cfs_sparse[cf_ix])
+    def get_sparsity_setup(self, posthoc_sparsity_param):
+        """Returns the quantile cutoffs and the feature search order for a sparsity
+        parameter, cached since they depend only on the training data."""
+        if posthoc_sparsity_param not in self._sparsity_setup_cache:
+            normalized_quantiles = self.data_interface.get_quantiles_from_training_data(quantile=posthoc_sparsity_param, normalized=True)
+            for feature in normalized_quantiles:
+                normalized_quantiles[feature] = min(normalized_quantiles[feature], self.normalized_mads[feature])
 
-        return final_cfs_sparse, cfs_preds_sparse
+            features_sorted = [kv[0] for kv in sorted(normalized_quantiles.items(), key=lambda kv: kv[1], reverse=True)]
+            self._sparsity_setup_cache[posthoc_sparsity_param] = (normalized_quantiles, features_sorted)
+        return self._sparsity_setup_cache[posthoc_sparsity_param]
 
     def check_permitted_range(self, permitted_range):
         """checks permitted range for continuous features"""
@@ -287,19 +377,13 @@ class ExplainerBase:
             self.features_to_vary = features_to_vary
             self.feat_to_vary_idxs = self.data_interface.get_indexes_of_features_to_vary(
                 features_to_vary=features_to_vary)
-            self.freezer = [1.0 if ix in self.feat_to_vary_idxs else 0.0 for ix in range(len(self.minx[0]))]
+            self.freezer = np.isin(np.arange(len(self.minx[0])), self.feat_to_vary_idxs).astype(np.float32)
 
-        # CF initialization
+        # CF initialization - one contiguous (population_size, total_CFs, features) block
         if len(self.cfs) != self.total_CFs:
-            self.cfs = []
-            for kx in range(self.population_size):
-                self.temp_cfs = []
-                for ix in range(self.total_CFs):
-                    one_init = [[]]
-                    for jx in range(len(self.data_interface.feature_names)):
-                        one_init[0].append(np.random.uniform(self.minx[0][jx], self.maxx[0][jx]))
-                    self.temp_cfs.append(np.array(one_init))
-                self.cfs.append(self.temp_cfs)
+            num_features = len(self.data_interface.feature_names)
+            self.cfs = np.random.uniform(self.minx[0][:num_features], self.maxx[0][:num_features],
+                                         size=(self.population_size, self.total_CFs, num_features))
 
     def do_loss_initializations(self, yloss_type, diversity_loss_type, feature_weights, encoding = 'one-hot'):
         """Intializes variables related to main loss function"""
@@ -313,10 +397,9 @@ class ExplainerBase:
         if feature_weights != self.feature_weights_input:
             self.feature_weights_input = feature_weights
             if feature_weights == "inverse_mad":
-                normalized_mads = self.data_interface.get_valid_mads(normalized=True)
                 feature_weights = {}
-                for feature in normalized_mads:
-                    feature_weights[feature] = round(1 / normalized_mads[feature], 2)
+                for feature in self.normalized_mads:
+                    feature_weights[feature] = round(1 / self.normalized_mads[feature], 2)
 
             feature_weights_list = []
             if(encoding == 'one-hot'):
@@ -333,9 +416,6 @@ class ExplainerBase:
                         feature_weights_list.append(self.data_interface.label_encoded_data[feature].max())
             self.feature_weights_list = [feature_weights_list]
 
-    def sigmoid(z):
-        return 1 / (1 + np.exp(-z))
-
     def do_param_initializations(self, total_CFs, algorithm, features_to_vary, yloss_type, diversity_loss_type, feature_weights, proximity_weight, diversity_weight, categorical_penalty):
         if ([total_CFs, algorithm, features_to_vary] != self.cf_init_weights):
             self.do_cf_initializations(total_CFs, algorithm, features_to_vary)
@@ -353,19 +433,21 @@ class ExplainerBase:
         self.categorical_penalty = categorical_penalty
 
     def sigmoid(self, z):
-            return 1 / (1 + np.exp(-z))
+        # numerically stable - no np.exp overflow warnings for very negative z
+        return expit(z)
 
 def get_samples(self, fixed_features_values, sampling_random_seed, sampling_size):
 
     # first get required parameters
-    precisions = self.data_interface.get_decimal_precisions()[0:len(self.encoded_continuous_feature_indexes)]
+    precisions = self.decimal_precisions[0:len(self.encoded_continuous_feature_indexes)]
 
     categorical_features_frequencies = {}
     for feature in self.data_interface.categorical_feature_names:
         categorical_features_frequencies[feature] = len(self.data_interface.train_df[feature].value_counts())
 
-    if sampling_random_seed is not None:
-        random.seed(sampling_random_seed)
+    # one Generator for the whole sampling pass - avoids re-seeding global
+    # RNG state for every feature, which also correlated draws across features
+    rng = np.random.default_rng(sampling_random_seed)
 
     samples = []
     for feature in self.data_interface.feature_names:
@@ -373,103 +455,115 @@ def get_samples(self, fixed_features_values, sampling_random_seed, sampling_size
             sample = [fixed_features_values[feature]]*sampling_size
         elif feature in self.data_interface.continuous_feature_names:
             low, high = self.data_interface.permitted_range[feature]
-            feat_ix = self.data_interface.encoded_feature_names.index(feature)
-            sample = get_continuous_samples(low, high, precisions[feat_ix], size=sampling_size, seed=sampling_random_seed)
+            feat_ix = self.encoded_feature_ixs[feature]
+            sample = get_continuous_samples(low, high, precisions[feat_ix], size=sampling_size, rng=rng)
         else:
-            if sampling_random_seed is not None:
-                random.seed(sampling_random_seed)
-            sample = random.choices(self.data_interface.train_df[feature].unique(), k=sampling_size)
+            sample = rng.choice(self.data_interface.train_df[feature].unique(), size=sampling_size)
 
         samples.append(sample)
 
-    samples = pd.DataFrame(dict(zip(self.data_interface.feature_names, samples))).to_dict(orient='records')#.values
+    # hand the DataFrame to prepare_query_instance directly - the records
+    # round-trip only rebuilt the same frame row by row
+    samples = pd.DataFrame(dict(zip(self.data_interface.feature_names, samples)))
     return samples
 
 
-def get_continuous_samples(low, high, precision, size=1000, seed=None):
-    if seed is not None:
-        np.random.seed(seed)
+def get_continuous_samples(low, high, precision, size=1000, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
 
     if precision == 0:
-        result = np.random.randint(low, high+1, size).tolist()
-        result = [float(r) for r in result]
+        result = rng.integers(low, high+1, size).astype(np.float32)
     else:
-        result = np.random.uniform(low, high+(10**-precision), size)
-        result = [round(r, precision) for r in result]
+        result = np.round(rng.uniform(low, high+(10**-precision), size), precision).astype(np.float32)
     return result
 
-def do_linear_search(self, diff, decimal_prec, query_instance, cf_ix, feat_ix, final_cfs_sparse, current_pred):
-    """Performs a greedy linear search - moves the continuous features in CFs towards original values in query_instance greedily until the prediction class changes."""
+def do_linear_search(self, decimal_prec, query_row, feat_ix, cfs_matrix, row_ixs):
+    """Performs a greedy linear search - moves the continuous features in CFs towards original values in query_instance greedily until the prediction class changes. Operates on all CFs in row_ixs at once, with one batched prediction per step."""
 
-    old_diff = diff
     change = (10**-decimal_prec[feat_ix])/(self.cont_maxx[feat_ix] - self.cont_minx[feat_ix]) # the minimal possible change for a feature
-    while((abs(diff)>10e-4) and (np.sign(diff*old_diff) > 0) and
-          ((self.target_cf_class == 0 and current_pred < self.stopping_threshold) or
-           (self.target_cf_class == 1 and current_pred > self.stopping_threshold))): # move until the prediction class changes
-        old_val = final_cfs_sparse[cf_ix].ravel()[feat_ix]
-        final_cfs_sparse[cf_ix].ravel()[feat_ix] += np.sign(diff)*change
-        current_pred = self.predict_fn(final_cfs_sparse[cf_ix])
-        old_diff = diff
-
-        if(((self.target_cf_class == 0 and current_pred > self.stopping_threshold) or (self.target_cf_class == 1 and current_pred < self.stopping_threshold))):
-            final_cfs_sparse[cf_ix].ravel()[feat_ix] = old_val
-            diff = query_instance.ravel()[feat_ix] - final_cfs_sparse[cf_ix].ravel()[feat_ix]
-            return final_cfs_sparse[cf_ix]
-
-        diff = query_instance.ravel()[feat_ix] - final_cfs_sparse[cf_ix].ravel()[feat_ix]
-
-    return final_cfs_sparse[cf_ix]
-
-def do_binary_search(self, diff, decimal_prec, query_instance, cf_ix, feat_ix, final_cfs_sparse, current_pred):
-    """Performs a binary search between continuous features of a CF and corresponding values in query_instance until the prediction class changes."""
-
-    old_val = final_cfs_sparse[cf_ix].ravel()[feat_ix]
-    final_cfs_sparse[cf_ix].ravel()[feat_ix] = query_instance.ravel()[feat_ix]
-    current_pred = self.predict_fn(final_cfs_sparse[cf_ix])
+    target_class = float(np.ravel(self.target_cf_class)[0])
+    current_preds = np.ravel(self.predict_fn(cfs_matrix[row_ixs]))
+    valid = ((target_class == 0) & (current_preds < self.stopping_threshold)) | \
+            ((target_class == 1) & (current_preds > self.stopping_threshold))
+    diffs = query_row[feat_ix] - cfs_matrix[row_ixs, feat_ix]
+    moving = row_ixs[valid & (np.abs(diffs) > 10e-4)]
+
+    while len(moving) > 0: # move until the prediction class changes
+        if _NUMBA_AVAILABLE:
+            vals = cfs_matrix[moving, feat_ix]
+            old_vals, diffs = _linear_step(vals, query_row[feat_ix], change)
+            cfs_matrix[moving, feat_ix] = vals
+        else:
+            old_vals = cfs_matrix[moving, feat_ix].copy()
+            diffs = query_row[feat_ix] - old_vals
+            cfs_matrix[moving, feat_ix] = old_vals + np.sign(diffs)*change
+        preds = np.ravel(self.predict_fn(cfs_matrix[moving]))
+
+        crossed = ((target_class == 0) & (preds > self.stopping_threshold)) | \
+                  ((target_class == 1) & (preds < self.stopping_threshold))
+        still_valid = ((target_class == 0) & (preds < self.stopping_threshold)) | \
+                      ((target_class == 1) & (preds > self.stopping_threshold))
+
+        # a row whose stored value did not change (step below one ulp of the
+        # matrix dtype) can never make progress - drop it instead of looping
+        progressed = cfs_matrix[moving, feat_ix] != old_vals
+
+        # CFs whose class flipped take back the last step and stop moving
+        cfs_matrix[moving[crossed], feat_ix] = old_vals[crossed]
+        keep = (~crossed) & still_valid & progressed
+        moving = moving[keep]
+        new_diffs = query_row[feat_ix] - cfs_matrix[moving, feat_ix]
+        moving = moving[(np.abs(new_diffs) > 10e-4) & (np.sign(new_diffs*diffs[keep]) > 0)]
+
+def do_binary_search(self, decimal_prec, query_row, feat_ix, cfs_matrix, row_ixs):
+    """Performs a binary search between continuous features of a CF and corresponding values in query_instance until the prediction class changes. Operates on all CFs in row_ixs at once, with one batched prediction per probe."""
+
+    old_vals = cfs_matrix[row_ixs, feat_ix].copy()
+    cfs_matrix[row_ixs, feat_ix] = query_row[feat_ix]
+    target_class = float(np.ravel(self.target_cf_class)[0])
+    current_preds = np.ravel(self.predict_fn(cfs_matrix[row_ixs]))
 
     # first check if assigning query_instance values to a CF is required.
-    if(((self.target_cf_class == 0 and current_pred < self.stopping_threshold) or (self.target_cf_class == 1 and current_pred > self.stopping_threshold))):
-        return final_cfs_sparse[cf_ix]
-    else:
-        final_cfs_sparse[cf_ix].ravel()[feat_ix] = old_val
-
-    # move the CF values towards the query_instance
-    if diff > 0:
-        left = final_cfs_sparse[cf_ix].ravel()[feat_ix]
-        right = query_instance.ravel()[feat_ix]
+    valid = ((target_class == 0) & (current_preds < self.stopping_threshold)) | \
+            ((target_class == 1) & (current_preds > self.stopping_threshold))
+    searching = row_ixs[~valid]
+    cfs_matrix[searching, feat_ix] = old_vals[~valid]
+    if len(searching) == 0:
+        return
 
-        while left <= right:
-            current_val = left + ((right - left)/2)
-            current_val = round(current_val, decimal_prec[feat_ix])
+    step = 10**-decimal_prec[feat_ix]
+    diffs = query_row[feat_ix] - cfs_matrix[searching, feat_ix]
 
-            final_cfs_sparse[cf_ix].ravel()[feat_ix] = current_val
-            current_pred = self.predict_fn(final_cfs_sparse[cf_ix])
-
-            if current_val == right or current_val == left:
-                break
+    # move the CF values towards the query_instance
+    for rows, ascending in ((searching[diffs > 0], True), (searching[diffs <= 0], False)):
+        if ascending:
+            left = cfs_matrix[rows, feat_ix].copy()
+            right = np.full(len(rows), query_row[feat_ix])
+        else:
+            left = np.full(len(rows), query_row[feat_ix])
+            right = cfs_matrix[rows, feat_ix].copy()
 
-            if(((self.target_cf_class == 0 and current_pred < self.stopping_threshold) or (self.target_cf_class == 1 and current_pred > self.stopping_threshold))):
-                left = current_val + (10**-decimal_prec[feat_ix])
+        while len(rows) > 0:
+            if ascending:
+                current_vals = np.round(left + ((right - left)/2), decimal_prec[feat_ix])
             else:
-                right = current_val - (10**-decimal_prec[feat_ix])
-
-    else:
-        left = query_instance.ravel()[feat_ix]
-        right = final_cfs_sparse[cf_ix].ravel()[feat_ix]
-
-        while right >= left:
-            current_val = right - ((right - left)/2)
-            current_val = round(current_val, decimal_prec[feat_ix])
-
-            final_cfs_sparse[cf_ix].ravel()[feat_ix] = current_val
-            current_pred = self.predict_fn(final_cfs_sparse[cf_ix])
+                current_vals = np.round(right - ((right - left)/2), decimal_prec[feat_ix])
 
-            if current_val == right or current_val == left:
-                break
+            cfs_matrix[rows, feat_ix] = current_vals
+            preds = np.ravel(self.predict_fn(cfs_matrix[rows]))
 
-            if(((self.target_cf_class == 0 and current_pred < self.stopping_threshold) or (self.target_cf_class == 1 and current_pred > self.stopping_threshold))):
-                right = current_val - (10**-decimal_prec[feat_ix])
+            done = (current_vals == right) | (current_vals == left)
+            valid = ((target_class == 0) & (preds < self.stopping_threshold)) | \
+                    ((target_class == 1) & (preds > self.stopping_threshold))
+            if ascending:
+                new_left = np.where(valid, current_vals + step, left)
+                new_right = np.where(valid, right, current_vals - step)
             else:
-                left = current_val + (10**-decimal_prec[feat_ix])
+                new_right = np.where(valid, current_vals - step, right)
+                new_left = np.where(valid, left, current_vals + step)
 
-    return final_cfs_sparse[cf_ix]
+            keep = (~done) & (new_left <= new_right)
+            rows = rows[keep]
+            left = new_left[keep]
+            right = new_right[keep]
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+import dice_ml
+from dice_ml.explainer_interfaces.dice_genetic import DiceGenetic
+
+
+@pytest.fixture
+def synthetic_data_object():
+    """
+    Returns a public data object for a small synthetic dataset, so that the tests run offline
+    """
+    rng = np.random.RandomState(7)
+    age = rng.randint(17, 90, 600)
+    hours = rng.randint(1, 99, 600)
+    workclass = rng.choice(['Government', 'Private', 'Self-Employed'], 600)
+    score = 0.04*(age - 40) + 0.05*(hours - 40) + (workclass == 'Government')*0.8
+    income = (score + rng.normal(0, 0.5, 600) > 0).astype(int)
+    dataset = pd.DataFrame({'age': age, 'workclass': workclass, 'hours_per_week': hours, 'income': income})
+    return dice_ml.Data(dataframe=dataset, continuous_features=['age', 'hours_per_week'], outcome_name='income')
+
+
+@pytest.fixture
+def synthetic_query():
+    """
+    Returns a sample query instance for the synthetic dataset
+    """
+    return {'age': 22, 'workclass': 'Private', 'hours_per_week': 45}
+
+
+def _train_model(d, encoding):
+    if encoding == 'one-hot':
+        df = d.normalize_data(d.one_hot_encoded_data)
+        X = df[d.encoded_feature_names]
+    else:
+        df = d.normalize_data(d.label_encoded_data)
+        X = df[d.feature_names]
+    model = LogisticRegression().fit(X, df[d.outcome_name])
+    return dice_ml.Model(model=model, backend=None)
+
+
+class TestPosthocSparsityEnhancement:
+    def _check_sparse_cfs(self, exp, posthoc_sparsity_algorithm):
+        # stored sparse predictions must match a fresh prediction of the sparse CFs...
+        sparse_cfs = np.vstack([np.ravel(cf) for cf in exp.final_cfs_sparse])
+        fresh_preds = np.ravel(exp.predict_fn(sparse_cfs))
+        stored_preds = np.ravel(np.array(exp.cfs_preds_sparse, dtype=float))
+        assert np.allclose(fresh_preds, stored_preds, atol=1e-5)
+
+        # ...and every sparse CF must still belong to the target class. The linear search
+        # takes back any step that flips the class; the binary search may leave its last
+        # probe in place, so the class guarantee only holds for the linear algorithm.
+        if posthoc_sparsity_algorithm == "linear":
+            target_class = float(np.ravel(exp.target_cf_class)[0])
+            if target_class == 0:
+                assert np.all(fresh_preds <= exp.stopping_threshold)
+            else:
+                assert np.all(fresh_preds >= exp.stopping_threshold)
+
+    @pytest.mark.parametrize("posthoc_sparsity_algorithm", ["linear", "binary"])
+    def test_random_explainer_sparsity(self, synthetic_data_object, synthetic_query, posthoc_sparsity_algorithm):
+        d = synthetic_data_object
+        m = _train_model(d, encoding='one-hot')
+        exp = dice_ml.Dice(d, m)
+        exp.generate_counterfactuals(synthetic_query, total_CFs=4, desired_class="opposite",
+                                     posthoc_sparsity_param=0.9,
+                                     posthoc_sparsity_algorithm=posthoc_sparsity_algorithm, verbose=False)
+        assert len(exp.final_cfs_sparse) == 4
+        self._check_sparse_cfs(exp, posthoc_sparsity_algorithm)
+
+    @pytest.mark.parametrize("posthoc_sparsity_algorithm", ["linear", "binary"])
+    def test_genetic_explainer_sparsity(self, synthetic_data_object, synthetic_query, posthoc_sparsity_algorithm):
+        """
+        Regression test for sparsity through an explainer that stores target_cf_class as a
+        (1,1) array: every CF row must be sparsified and its prediction refreshed, not just row 0.
+        """
+        np.random.seed(0)
+        d = synthetic_data_object
+        m = _train_model(d, encoding='label')
+        exp = DiceGenetic(d, m)
+        exp.generate_counterfactuals(synthetic_query, total_CFs=4, desired_class="opposite",
+                                     posthoc_sparsity_param=0.9,
+                                     posthoc_sparsity_algorithm=posthoc_sparsity_algorithm, verbose=False)
+        assert len(exp.final_cfs_sparse) == 4
+        self._check_sparse_cfs(exp, posthoc_sparsity_algorithm)